@@ -27,6 +27,7 @@ add_arg('metrics_type',     str,   'cer',                     '计算错误率
 add_arg('decoder',          str,   'ctc_beam_search',         '结果解码方法', choices=['ctc_beam_search', 'ctc_greedy'])
 add_arg('resume_model',     str,   'models/{}_{}/best_model/',                    "模型的路径")
 add_arg('lang_model_path',  str,   'lm/zh_giga.no_cna_cmn.prune01244.klm',        "语言模型文件路径")
+add_arg('feature_cache_dir',str,   None,                      '测试数据特征缓存的文件夹，当为None时不使用缓存')
 args = parser.parse_args()
 print_arguments(args)
 
@@ -45,7 +46,8 @@ trainer = PPASRTrainer(use_model=args.use_model,
                        cutoff_top_n=args.cutoff_top_n,
                        decoder=args.decoder,
                        metrics_type=args.metrics_type,
-                       lang_model_path=args.lang_model_path)
+                       lang_model_path=args.lang_model_path,
+                       feature_cache_dir=args.feature_cache_dir)
 
 start = time.time()
 error_rate = trainer.evaluate(batch_size=args.batch_size,
@@ -291,11 +291,25 @@ class AudioSegment(object):
         :raises ValueError: If the required gain to normalize the segment to
                             the target_db value exceeds max_gain_db.
         """
+        self.gain_db(self.normalize_gain_db(target_db=target_db, max_gain_db=max_gain_db))
+
+    def normalize_gain_db(self, target_db=-20, max_gain_db=300.0):
+        """计算将音频归一化到target_db所需的增益(以分贝为单位)，不修改音频
+
+        :param target_db: Target RMS value in decibels.
+        :type target_db: float
+        :param max_gain_db: Max amount of gain in dB that can be applied for normalization.
+        :type max_gain_db: float
+        :return: 需要施加的分贝增益
+        :rtype: float
+        :raises ValueError: If the required gain to normalize the segment to
+                            the target_db value exceeds max_gain_db.
+        """
         gain = target_db - self.rms_db
         if gain > max_gain_db:
             raise ValueError(
                 "无法将段规范化到 %f dB，因为可能的增益已经超过max_gain_db (%f dB)" % (target_db, max_gain_db))
-        self.gain_db(min(max_gain_db, target_db - self.rms_db))
+        return min(max_gain_db, gain)
 
     def resample(self, target_sample_rate, filter='kaiser_best'):
         """按目标采样率重新采样音频
@@ -9,6 +9,7 @@ from ppasr.data_utils.augmentor.shift_perturb import ShiftPerturbAugmentor
 from ppasr.data_utils.augmentor.speed_perturb import SpeedPerturbAugmentor
 from ppasr.data_utils.augmentor.noise_perturb import NoisePerturbAugmentor
 from ppasr.data_utils.augmentor.spec_augment import SpecAugmentor
+from ppasr.data_utils.augmentor.spec_augment_gpu import SpecAugmentorGPU
 from ppasr.data_utils.augmentor.resample import ResampleAugmentor
 from ppasr.utils.logger import setup_logger
 
@@ -95,6 +96,23 @@ class AugmentationPipeline(object):
         self._rng = random.Random(random_seed)
         self._augmentors, self._rates = self._parse_pipeline_from(augmentation_config, aug_type='audio')
         self._spec_augmentors, self._spec_rates = self._parse_pipeline_from(augmentation_config, aug_type='feature')
+        # 和频谱增强参数相同、在训练设备上按批次执行的版本
+        self._gpu_spec_augmentors = [SpecAugmentorGPU(F=augmentor.F,
+                                                      T=augmentor.T,
+                                                      n_freq_masks=augmentor.n_freq_masks,
+                                                      n_time_masks=augmentor.n_time_masks,
+                                                      replace_with_zero=augmentor.replace_with_zero,
+                                                      prob=rate)
+                                     for augmentor, rate in zip(self._spec_augmentors, self._spec_rates)]
+
+    @property
+    def has_audio_augmentor(self):
+        """是否会对音频做数据增强，为False时提取的特征是确定的，可以缓存
+
+        :return: 是否包含会生效的音频增强
+        :rtype: bool
+        """
+        return any(rate > 0 for rate in self._rates)
 
     def transform_audio(self, audio_segment):
         """Run the pre-processing pipeline for data augmentation.
@@ -119,6 +137,20 @@ class AugmentationPipeline(object):
                 spec_segment = augmentor.transform_feature(spec_segment)
         return spec_segment
 
+    def transform_feature_batch(self, inputs, input_lens):
+        """在训练设备上对一个批次的特征做频谱增强，代替在数据读取进程中逐条执行的transform_feature。
+
+        :param inputs: 已经padding的一批特征，(B, T, D)
+        :type inputs: paddle.Tensor
+        :param input_lens: 每条特征的有效长度，(B,)
+        :type input_lens: paddle.Tensor
+        :return: 增强后的特征
+        :rtype: paddle.Tensor
+        """
+        for augmentor in self._gpu_spec_augmentors:
+            inputs = augmentor(inputs, input_lens)
+        return inputs
+
     def _parse_pipeline_from(self, config_json, aug_type):
         """Parse the config json to build a augmentation pipelien."""
         try:
@@ -0,0 +1,75 @@
+import paddle
+
+
+class SpecAugmentorGPU(object):
+    """在训练设备上对一个批次的特征做频率屏蔽和时间屏蔽，和SpecAugmentor的屏蔽方式一致，
+    但所有数据的屏蔽在几次张量运算中一起完成，不再占用数据读取进程的CPU。
+
+    不支持时间变形(time warp)，需要时间变形的请使用SpecAugmentor。
+
+    :param F: 频率屏蔽参数
+    :type F: int
+    :param T: 时间屏蔽参数
+    :type T: int
+    :param n_freq_masks: 频率屏蔽数量
+    :type n_freq_masks: int
+    :param n_time_masks: 时间屏蔽数量
+    :type n_time_masks: int
+    :param replace_with_zero: 如果真的话，在pad补0，否则使用平均值
+    :type replace_with_zero: bool
+    :param prob: 每条数据使用该增强的概率
+    :type prob: float
+    """
+
+    def __init__(self,
+                 F=30,
+                 T=40,
+                 n_freq_masks=2,
+                 n_time_masks=2,
+                 replace_with_zero=False,
+                 prob=1.0):
+        self.F = F
+        self.T = T
+        self.n_freq_masks = n_freq_masks
+        self.n_time_masks = n_time_masks
+        self.replace_with_zero = replace_with_zero
+        self.prob = prob
+
+    def __repr__(self):
+        return f"specaug_gpu: F-{self.F}, T-{self.T}, F-n-{self.n_freq_masks}, T-n-{self.n_time_masks}"
+
+    def __call__(self, inputs, input_lens):
+        """
+        Args:
+            inputs (paddle.Tensor): `[B, T, F]`，已经padding的一批特征
+            input_lens (paddle.Tensor): `[B]`，每条特征的有效长度
+        Returns:
+            inputs (paddle.Tensor): `[B, T, F]`
+        """
+        batch_size, max_len, num_bins = inputs.shape
+        lens = input_lens.astype('float32').unsqueeze(1)
+        time_idx = paddle.arange(max_len, dtype='float32').unsqueeze(0)
+        freq_idx = paddle.arange(num_bins, dtype='float32').unsqueeze(0)
+        # 只屏蔽有效长度内的帧，padding部分保持为0
+        valid = time_idx < lens
+        freq_mask = paddle.zeros([batch_size, num_bins], dtype='bool')
+        for _ in range(self.n_freq_masks):
+            width = paddle.randint(0, self.F, [batch_size, 1]).astype('float32')
+            start = paddle.floor(paddle.rand([batch_size, 1]) * (num_bins - width))
+            freq_mask = paddle.logical_or(freq_mask, paddle.logical_and(freq_idx >= start, freq_idx < start + width))
+        time_mask = paddle.zeros([batch_size, max_len], dtype='bool')
+        for _ in range(self.n_time_masks):
+            width = paddle.minimum(paddle.randint(0, self.T, [batch_size, 1]).astype('float32'), lens)
+            start = paddle.floor(paddle.rand([batch_size, 1]) * (lens - width))
+            time_mask = paddle.logical_or(time_mask, paddle.logical_and(time_idx >= start, time_idx < start + width))
+        mask = paddle.logical_or(freq_mask.unsqueeze(1), time_mask.unsqueeze(2))
+        mask = paddle.logical_and(mask, valid.unsqueeze(2))
+        # 每条数据按概率决定是否增强
+        apply = paddle.rand([batch_size, 1, 1]) < self.prob
+        mask = paddle.logical_and(mask, apply).astype(inputs.dtype)
+        if self.replace_with_zero:
+            return inputs * (1 - mask)
+        # 使用每条数据有效部分的平均值填充
+        valid = valid.astype(inputs.dtype).unsqueeze(2)
+        mean = (inputs * valid).sum(axis=[1, 2], keepdim=True) / (lens.unsqueeze(2) * num_bins)
+        return inputs * (1 - mask) + mean * mask
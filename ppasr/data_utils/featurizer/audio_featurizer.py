@@ -1,11 +1,50 @@
 import numpy as np
 import paddle
+from numba import njit
 from paddleaudio.compliance.kaldi import mfcc, fbank
+from scipy.fft import rfft as _rfft
 
 from ppasr.data_utils.audio import AudioSegment
 from ppasr.data_utils.utils import delta
 
 
+# 按(window_size, stride_size)特化的线性谱图核函数，帧长、帧移和频点数是闭包常量，
+# Numba编译时会把它们当作字面量，循环边界固定后可以完全展开
+_SPECIALIZED = {}
+
+
+def _get_linear_kernels(window_size, stride_size):
+    key = (window_size, stride_size)
+    if key in _SPECIALIZED:
+        return _SPECIALIZED[key]
+    n_bins = window_size // 2 + 1
+
+    @njit(fastmath=True, cache=True)
+    def window_frames(samples, window, out):
+        """分帧并加窗，直接写入连续的FFT输入缓冲区(T, window_size)"""
+        for i in range(out.shape[0]):
+            start = i * stride_size
+            for k in range(window_size):
+                out[i, k] = samples[start + k] * window[k]
+
+    @njit(fastmath=True, cache=True)
+    def finalize_linear(fft, out, scale, eps, bias, mean, inv_std):
+        """一次遍历完成功率谱、缩放、取对数、分贝归一化和均值标准值归一化，直接写入输出(T, 161)，全程使用float32计算"""
+        inner_scale = np.float32(2.0) / scale
+        edge_scale = np.float32(1.0) / scale
+        for i in range(out.shape[0]):
+            for k in range(n_bins):
+                p = fft[i, k].real ** 2 + fft[i, k].imag ** 2
+                if 0 < k < n_bins - 1:
+                    p = p * inner_scale
+                else:
+                    p = p * edge_scale
+                out[i, k] = (np.log(p + eps) + bias - mean[k]) * inv_std[k]
+
+    _SPECIALIZED[key] = (window_frames, finalize_linear)
+    return _SPECIALIZED[key]
+
+
 class AudioFeaturizer(object):
     """音频特征器,用于从AudioSegment内容中提取特性。
 
@@ -24,7 +63,12 @@ class AudioFeaturizer(object):
     :type use_dB_normalization: bool
     :param target_dB: Target audio decibels for normalization.
     :type target_dB: float
+    :param feature_mean: 特征的均值，和feature_std一起传入时，输出的是已经归一化的特征
+    :type feature_mean: None|ndarray
+    :param feature_std: 特征的标准值
+    :type feature_std: None|ndarray
     """
+    eps = np.float32(1e-14)
 
     def __init__(self,
                  feature_method='linear',
@@ -33,7 +77,9 @@ class AudioFeaturizer(object):
                  target_sample_rate=16000,
                  use_dB_normalization=True,
                  target_dB=-20,
-                 train=False):
+                 train=False,
+                 feature_mean=None,
+                 feature_std=None):
         self._feature_method = feature_method
         self._stride_ms = stride_ms
         self._window_ms = window_ms
@@ -41,6 +87,24 @@ class AudioFeaturizer(object):
         self._use_dB_normalization = use_dB_normalization
         self._target_dB = target_dB
         self.train = train
+        # 线性谱图的帧参数在特征器生命周期内是固定的，提前计算好
+        self._window_size = int(0.001 * target_sample_rate * window_ms)
+        self._stride_size = int(0.001 * target_sample_rate * stride_ms)
+        self._window = np.hanning(self._window_size).astype(np.float32)
+        self._scale = np.float32((self._window ** 2).sum() * target_sample_rate)
+        # rfft输出的频点数，最高频点(window_size // 2) * sample_rate / window_size不会超过奈奎斯特频率，无需截断
+        self._n_bins = self._window_size // 2 + 1
+        assert (self._n_bins - 1) * target_sample_rate <= self._window_size * target_sample_rate / 2
+        # 分帧的缓冲区，按2的幂扩大并在多次调用之间复用，每个DataLoader读取进程各有一份
+        self._frame_buf = None
+        # 归一化参数，线性谱图在finalize_linear核函数中顺带完成归一化，没有传入时使用不改变特征的0和1
+        self.normalized = feature_mean is not None and feature_std is not None
+        if self.normalized:
+            self._mean = np.asarray(feature_mean, dtype=np.float32)
+            self._inv_std = np.float32(1.0) / np.asarray(feature_std, dtype=np.float32)
+        else:
+            self._mean = np.zeros(self.feature_dim, dtype=np.float32)
+            self._inv_std = np.ones(self.feature_dim, dtype=np.float32)
 
     def featurize(self, audio_segment, allow_downsampling=True, allow_upsampling=True):
         """从AudioSegment中提取音频特征
@@ -64,45 +128,55 @@ class AudioFeaturizer(object):
         if audio_segment.sample_rate != self._target_sample_rate:
             raise ValueError("Audio sample rate is not supported. "
                              "Turn allow_downsampling or allow up_sampling on.")
+        # extract spectrogram
+        if self._feature_method == 'linear':
+            # 对数谱图上的分贝归一化等价于加上一个常数，不需要先对音频做增益
+            gain_db = audio_segment.normalize_gain_db(target_db=self._target_dB) if self._use_dB_normalization else 0.0
+            return self._compute_linear(samples=audio_segment.samples, gain_db=gain_db)
         # decibel normalization
         if self._use_dB_normalization:
             audio_segment.normalize(target_db=self._target_dB)
-        # extract spectrogram
-        if self._feature_method == 'linear':
-            return self._compute_linear(samples=audio_segment.samples, sample_rate=audio_segment.sample_rate,
-                                        stride_ms=self._stride_ms, window_ms=self._window_ms)
-        elif self._feature_method == 'mfcc':
-            samples = audio_segment.to('int16')
-            return self._compute_mfcc(samples=samples, sample_rate=audio_segment.sample_rate)
+        if self._feature_method == 'mfcc':
+            samples = self._to_int16_range(audio_segment.samples)
+            feature = self._compute_mfcc(samples=samples, sample_rate=audio_segment.sample_rate)
         elif self._feature_method == 'fbank':
-            samples = audio_segment.to('int16')
-            return self._compute_fbank(samples=samples, sample_rate=audio_segment.sample_rate)
+            samples = self._to_int16_range(audio_segment.samples)
+            feature = self._compute_fbank(samples=samples, sample_rate=audio_segment.sample_rate)
         else:
             raise Exception('没有{}预处理方法'.format(self._feature_method))
+        if self.normalized:
+            # 特征是新创建的float32数组，直接原地归一化
+            feature -= self._mean
+            feature *= self._inv_std
+        return feature
 
-    # 用快速傅里叶变换计算线性谱图
+    # Kaldi的特征按int16的幅度计算，这里直接在float32上缩放和截断，省去转换为int16再转回float32
     @staticmethod
-    def _compute_linear(samples, sample_rate, stride_ms=10.0, window_ms=20.0, eps=1e-14):
-        stride_size = int(0.001 * sample_rate * stride_ms)
-        window_size = int(0.001 * sample_rate * window_ms)
-        truncate_size = (len(samples) - window_size) % stride_size
-        samples = samples[:len(samples) - truncate_size]
-        nshape = (window_size, (len(samples) - window_size) // stride_size + 1)
-        nstrides = (samples.strides[0], samples.strides[0] * stride_size)
-        windows = np.lib.stride_tricks.as_strided(samples, shape=nshape, strides=nstrides)
-        assert np.all(windows[:, 1] == samples[stride_size:(stride_size + window_size)])
-        # 快速傅里叶变换
-        weighting = np.hanning(window_size)[:, None]
-        fft = np.fft.rfft(windows * weighting, n=None, axis=0)
-        fft = np.absolute(fft)
-        fft = fft ** 2
-        scale = np.sum(weighting ** 2) * sample_rate
-        fft[1:-1, :] *= (2.0 / scale)
-        fft[(0, -1), :] /= scale
-        freqs = float(sample_rate) / window_size * np.arange(fft.shape[0])
-        ind = np.where(freqs <= (sample_rate / 2))[0][-1] + 1
-        linear_feat = np.log(fft[:ind, :] + eps)
-        linear_feat = linear_feat.transpose([1, 0])  # (T, 161)
+    def _to_int16_range(samples):
+        samples = np.multiply(samples, np.float32(32768), dtype=np.float32)
+        return np.clip(samples, -32768, 32767, out=samples)
+
+    # 用快速傅里叶变换计算线性谱图
+    def _compute_linear(self, samples, gain_db=0.0):
+        stride_size, window_size = self._stride_size, self._window_size
+        # 使用单精度计算，加窗和FFT的数据量减半
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        n_frames = (len(samples) - window_size) // stride_size + 1
+        if self._frame_buf is None or self._frame_buf.shape[0] < n_frames:
+            n_frames_bucket = 1 << int(n_frames - 1).bit_length()
+            self._frame_buf = np.empty((n_frames_bucket, window_size), dtype=np.float32)
+        # 按帧为主的布局(T, window_size)，FFT沿最后一维计算，结果即为(T, 161)
+        frames = self._frame_buf[:n_frames]
+        window_frames, finalize_linear = _get_linear_kernels(window_size, stride_size)
+        window_frames(samples, self._window, frames)
+        # 快速傅里叶变换，DataLoader已经在样本间并行，这里只使用单线程，固定的n可以复用pocketfft缓存的计划
+        fft = _rfft(frames, n=window_size, axis=1, overwrite_x=True, workers=1)
+        # 输出会被collate_fn和同一批次的其他数据一起持有，不能复用缓冲区
+        linear_feat = np.empty((n_frames, self._n_bins), dtype=np.float32)
+        # 功率谱乘以增益G时，log(G * p + eps) = log(p + eps / G) + log(G)，缩小eps可以和先对音频做增益完全等价
+        bias = gain_db * np.log(10) / 10
+        eps = np.float32(max(self.eps * np.exp(-bias), np.finfo(np.float32).tiny))
+        finalize_linear(fft, linear_feat, self._scale, eps, np.float32(bias), self._mean, self._inv_std)
         return linear_feat
 
     def _compute_mfcc(self,
@@ -118,7 +192,7 @@ class AudioFeaturizer(object):
         n_frame_shift = n_shift / num_point_ms
 
         dither = dither if self.train else 0.0
-        waveform = paddle.to_tensor(np.expand_dims(samples, 0), dtype=paddle.float32)
+        waveform = paddle.to_tensor(samples[np.newaxis, :])
         # 计算MFCC
         mfcc_feat = mfcc(waveform,
                          n_mels=n_mels,
@@ -128,13 +202,15 @@ class AudioFeaturizer(object):
                          energy_floor=energy_floor,
                          sr=sample_rate)
         mfcc_feat = mfcc_feat.numpy()
+        # 把MFCC、Deltas、Deltas-Deltas直接写入同一个(T, 39)数组，省去拼接时的复制
+        n_mfcc = mfcc_feat.shape[1]
+        feature = np.empty((mfcc_feat.shape[0], n_mfcc * 3), dtype=np.float32)
+        feature[:, :n_mfcc] = mfcc_feat
         # Deltas
-        d_feat = delta(mfcc_feat, 2)
+        delta(mfcc_feat, 2, out=feature[:, n_mfcc:2 * n_mfcc])
         # Deltas-Deltas
-        dd_feat = delta(mfcc_feat, 2)
-        # concat above three features
-        mfcc_feat = np.concatenate((mfcc_feat, d_feat, dd_feat), axis=1)  # (T, 39)
-        return mfcc_feat
+        delta(feature[:, n_mfcc:2 * n_mfcc], 2, out=feature[:, 2 * n_mfcc:])
+        return feature
 
     def _compute_fbank(self,
                        samples,
@@ -149,7 +225,7 @@ class AudioFeaturizer(object):
         n_frame_shift = n_shift / num_point_ms
 
         dither = dither if self.train else 0.0
-        waveform = paddle.to_tensor(np.expand_dims(samples, 0), dtype=paddle.float32)
+        waveform = paddle.to_tensor(samples[np.newaxis, :])
         # 计算Fbank
         mat = fbank(waveform,
                     n_mels=n_mels,
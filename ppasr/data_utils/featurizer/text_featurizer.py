@@ -22,7 +22,7 @@ class TextFeaturizer(object):
         for token in tokens:
             if token == ' ': token = '<space>'
             # 跳过词汇表不存在的字符
-            if token not in self._vocab_list:
+            if token not in self._vocab_dict:
                 token = self.unk
             token_indices.append(self._vocab_dict[token])
         return token_indices
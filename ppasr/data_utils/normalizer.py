@@ -46,7 +46,7 @@ class FeatureNormalizer(object):
             self._compute_mean_std(manifest_path, num_samples, num_workers)
         else:
             self.mean, self.std = self._read_mean_std_from_file(mean_std_filepath)
-            self.std = np.maximum(self.std, eps)
+            self.std = np.maximum(self.std, eps).astype(np.float32)
 
     def apply(self, features):
         """使用均值和标准值计算音频特征的归一化值
@@ -115,8 +115,9 @@ class FeatureNormalizer(object):
                 if std[i] < 1.0e-20:
                     std[i] = 1.0e-20
                 std[i] = math.sqrt(std[i])
-            self.mean = means
-            self.std = std
+            # 保持float32，归一化时不会把特征提升为float64
+            self.mean = np.asarray(means, dtype=np.float32)
+            self.std = np.asarray(std, dtype=np.float32)
 
 
 class NormalizerDataset(Dataset):
@@ -130,7 +131,7 @@ class NormalizerDataset(Dataset):
         # 获取音频特征
         audio = AudioSegment.from_file(instance["audio_filepath"])
         feature = self.audio_featurizer.featurize(audio)
-        return feature.astype(np.float32), 0
+        return feature.astype(np.float32, copy=False), 0
 
     def __len__(self):
         return len(self.sampled_manifest)
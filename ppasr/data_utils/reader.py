@@ -1,8 +1,16 @@
-import json
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from paddle.io import Dataset
 
+# 大数据列表使用orjson解析更快，没有安装时使用标准库
+try:
+    from orjson import loads as json_loads
+except ModuleNotFoundError:
+    from json import loads as json_loads
+
 from ppasr.data_utils.audio import AudioSegment
 from ppasr.data_utils.augmentor.augmentation import AugmentationPipeline
 from ppasr.data_utils.featurizer.audio_featurizer import AudioFeaturizer
@@ -15,47 +23,137 @@ logger = setup_logger(__name__)
 
 # 音频数据加载器
 class PPASRDataset(Dataset):
+    # 读取数据出错时最多尝试的次数
+    max_retry = 3
+
     def __init__(self, data_list, vocab_filepath, mean_std_filepath, feature_method='linear',
-                 min_duration=0, max_duration=20, augmentation_config='{}', train=False):
+                 min_duration=0, max_duration=20, augmentation_config='{}', train=False, cache_dir=None,
+                 gpu_spec_augment=False):
         super(PPASRDataset, self).__init__()
         self._normalizer = FeatureNormalizer(mean_std_filepath, feature_method=feature_method)
         self._augmentation_pipeline = AugmentationPipeline(augmentation_config=augmentation_config)
-        self._audio_featurizer = AudioFeaturizer(feature_method=feature_method, train=train)
+        # 频谱增强放到训练设备上按批次执行，读取数据时不再做特征增强
+        self._gpu_spec_augment = gpu_spec_augment
+        # 归一化直接在提取特征时完成
+        self._audio_featurizer = AudioFeaturizer(feature_method=feature_method, train=train,
+                                                 feature_mean=self._normalizer.mean,
+                                                 feature_std=self._normalizer.std)
         self._text_featurizer = TextFeaturizer(vocab_filepath)
+        # 特征缓存，只有提取的特征是确定的才能使用：没有音频增强，且训练时mfcc、fbank不会加入随机抖动
+        self._cache_dir = None
+        if cache_dir is not None:
+            if self._augmentation_pipeline.has_audio_augmentor or (train and feature_method != 'linear'):
+                logger.warning('使用了音频增强或者随机抖动，已忽略特征缓存：{}'.format(cache_dir))
+            else:
+                cfg = feature_method + str(os.path.getmtime(mean_std_filepath))
+                cfg_hash = hashlib.blake2b(cfg.encode('utf-8'), digest_size=8).hexdigest()
+                self._cache_dir = os.path.join(cache_dir, cfg_hash)
+                os.makedirs(self._cache_dir, exist_ok=True)
         # 获取数据列表
-        with open(data_list, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        with open(data_list, 'rb') as f:
+            lines = f.read().splitlines()
         self.data_list = []
         for line in lines:
-            line = json.loads(line)
-            # 跳过超出长度限制的音频
-            if line["duration"] < min_duration:
+            if not line.strip():
+                continue
+            line = json_loads(line)
+            # 跳过超出长度限制或者长度异常的音频
+            if not line["duration"] > 0 or line["duration"] < min_duration:
                 continue
             if max_duration != -1 and line["duration"] > max_duration:
                 continue
-            self.data_list.append([line["audio_filepath"], line["text"]])
+            # tools/pack_shards.py生成的分片数据列表，音频是分片文件中的一段，标签是令牌文件中的一段
+            if "shard" in line:
+                audio_file = (line["shard"], line["offset"], line["length"], line["sample_rate"])
+            else:
+                audio_file = line["audio_filepath"]
+            if "tokens" in line:
+                transcript = (line["tokens"], line["tokens_offset"], line["tokens_length"])
+            else:
+                transcript = line["text"]
+            self.data_list.append([audio_file, transcript])
+        self.data_list = self._filter_missing(self.data_list)
+        # 分片文件和令牌文件的内存映射，在每个读取进程中按需打开
+        self._memmaps = {}
 
     def __getitem__(self, idx):
-        try:
-            # 分割音频路径和标签
-            audio_file, transcript = self.data_list[idx]
-            # 读取音频
-            audio_segment = AudioSegment.from_file(audio_file)
-            # 音频增强
-            self._augmentation_pipeline.transform_audio(audio_segment)
-            # 预处理，提取特征
-            feature = self._audio_featurizer.featurize(audio_segment)
-            transcript = self._text_featurizer.featurize(transcript)
-            # 归一化
-            feature = self._normalizer.apply(feature)
-            # 特征增强
-            feature = self._augmentation_pipeline.transform_feature(feature)
-            transcript = np.array(transcript, dtype=np.int32)
-            return feature.astype(np.float32), transcript
-        except Exception as ex:
-            logger.error("数据: {} 出错，错误信息: {}".format(self.data_list[idx], ex))
-            rnd_idx = np.random.randint(self.__len__())
-            return self.__getitem__(rnd_idx)
+        # 音频文件已经在初始化时检查过，这里出错只会是个别损坏的音频，换下一条数据重试
+        for retry in range(self.max_retry):
+            try:
+                # 分割音频路径和标签
+                audio_file, transcript = self.data_list[idx]
+                # 读取音频并提取归一化后的特征
+                feature = self._load_feature(audio_file)
+                transcript = self._load_tokens(transcript)
+                # 特征增强
+                if not self._gpu_spec_augment:
+                    feature = self._augmentation_pipeline.transform_feature(feature)
+                # 特征全程都是float32，这里通常不会再复制
+                return feature.astype(np.float32, copy=False), transcript
+            except Exception as ex:
+                logger.error("数据: {} 出错，错误信息: {}".format(self.data_list[idx], ex))
+                if retry == self.max_retry - 1:
+                    raise
+                idx = (idx + 1) % len(self.data_list)
+
+    @staticmethod
+    def _filter_missing(data_list):
+        """多线程检查音频文件、分片文件和令牌文件是否存在，去掉不存在的数据"""
+        def required_files(data):
+            audio_file, transcript = data
+            files = [audio_file if isinstance(audio_file, str) else audio_file[0]]
+            if not isinstance(transcript, str):
+                files.append(transcript[0])
+            return files
+
+        paths = list({path for data in data_list for path in required_files(data)})
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            exists = dict(zip(paths, executor.map(os.path.isfile, paths)))
+        valid_list = [data for data in data_list if all(exists[path] for path in required_files(data))]
+        if len(valid_list) < len(data_list):
+            logger.warning('有{}条数据的音频文件不存在，已经忽略'.format(len(data_list) - len(valid_list)))
+        return valid_list
+
+    def _load_feature(self, audio_file):
+        if self._cache_dir is not None:
+            cache_path = os.path.join(self._cache_dir, hashlib.sha1(str(audio_file).encode('utf-8')).hexdigest() + '.npy')
+            if os.path.exists(cache_path):
+                return np.load(cache_path)
+        # 读取音频
+        audio_segment = self._read_audio(audio_file)
+        # 音频增强
+        self._augmentation_pipeline.transform_audio(audio_segment)
+        # 预处理，提取归一化后的特征
+        feature = self._audio_featurizer.featurize(audio_segment)
+        if self._cache_dir is not None:
+            # 先写临时文件再重命名，避免多个读取进程读到写了一半的缓存
+            tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, feature)
+            os.replace(tmp_path, cache_path)
+        return feature
+
+    def _read_audio(self, audio_file):
+        if isinstance(audio_file, str):
+            return AudioSegment.from_file(audio_file)
+        shard_path, offset, length, sample_rate = audio_file
+        samples = np.asarray(self._get_memmap(shard_path, np.int16)[offset:offset + length])
+        return AudioSegment(samples, sample_rate)
+
+    def _load_tokens(self, transcript):
+        if isinstance(transcript, str):
+            return np.array(self._text_featurizer.featurize(transcript), dtype=np.int32)
+        tokens_path, offset, length = transcript
+        return np.asarray(self._get_memmap(tokens_path, np.int32)[offset:offset + length])
+
+    def _get_memmap(self, path, dtype):
+        if path not in self._memmaps:
+            self._memmaps[path] = np.memmap(path, dtype=dtype, mode='r')
+        return self._memmaps[path]
+
+    def transform_feature_batch(self, inputs, input_lens):
+        """在训练设备上对一个批次的特征做频谱增强，需要创建数据集时设置gpu_spec_augment=True"""
+        return self._augmentation_pipeline.transform_feature_batch(inputs, input_lens)
 
     def __len__(self):
         return len(self.data_list)
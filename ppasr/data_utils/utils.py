@@ -2,6 +2,7 @@ import json
 
 import audioread
 import numpy as np
+from numba import njit
 from pydub import AudioSegment
 
 
@@ -85,24 +86,36 @@ def buf_to_float(x, n_bytes=2, dtype=np.float32):
     return scale * np.frombuffer(x, fmt).astype(dtype)
 
 
-def delta(feat, N):
+def delta(feat, N, out=None):
     """Compute delta features from a feature vector sequence.
 
     :param feat: A numpy array of size (NUMFRAMES by number of features) containing features. Each row holds 1 feature vector.
     :param N: For each frame, calculate delta features based on preceding and following N frames
+    :param out: Optional array of the same shape as feat (e.g. a slice of a larger buffer) to write the result into.
     :returns: A numpy array of size (NUMFRAMES by number of features) containing delta features. Each row holds 1 delta feature vector.
     """
     if N < 1:
         raise ValueError('N must be an integer >= 1')
-    NUMFRAMES = len(feat)
-    denominator = 2 * sum([i**2 for i in range(1, N+1)])
-    delta_feat = np.empty_like(feat)
-    padded = np.pad(feat, ((N, N), (0, 0)), mode='edge')   # padded version of feat
-    for t in range(NUMFRAMES):
-        delta_feat[t] = np.dot(np.arange(-N, N+1), padded[t : t+2*N+1]) / denominator   # [t : t+2*N+1] == [(N+t)-N : (N+t)+N+1]
+    delta_feat = np.empty_like(feat) if out is None else out
+    _delta_numba(feat, N, delta_feat)
     return delta_feat
 
 
+@njit(fastmath=True, cache=True)
+def _delta_numba(feat, N, out):
+    """delta的Numba实现，边界帧按edge方式补齐，结果写入out，out可以是更大数组的切片"""
+    num_frames, num_feats = feat.shape
+    denominator = 0.0
+    for n in range(1, N + 1):
+        denominator += 2 * n * n
+    for t in range(num_frames):
+        for c in range(num_feats):
+            num = 0.0
+            for n in range(1, N + 1):
+                num += n * (feat[min(t + n, num_frames - 1), c] - feat[max(t - n, 0), c])
+            out[t, c] = num / denominator
+
+
 def opus_to_wav(opus_path, save_wav_path, rate=16000):
     source_wav = AudioSegment.from_file(opus_path)
     target_audio = source_wav.set_frame_rate(rate)
@@ -52,7 +52,8 @@ class PPASRTrainer(object):
                  cutoff_top_n=40,
                  decoder='ctc_greedy',
                  metrics_type='cer',
-                 lang_model_path='lm/zh_giga.no_cna_cmn.prune01244.klm'):
+                 lang_model_path='lm/zh_giga.no_cna_cmn.prune01244.klm',
+                 feature_cache_dir=None):
         """
         PPASR集成工具类
         :param use_model: 所使用的模型
@@ -71,6 +72,7 @@ class PPASRTrainer(object):
         :param metrics_type: 计算错误方法
         :param decoder: 结果解码方法，支持ctc_beam_search和ctc_greedy
         :param lang_model_path: 语言模型文件路径
+        :param feature_cache_dir: 测试数据特征缓存的文件夹，当为None时不使用缓存
         """
         self.use_model = use_model
         assert self.use_model in SUPPORT_MODEL, f'没有该模型：{self.use_model}'
@@ -89,6 +91,7 @@ class PPASRTrainer(object):
         self.decoder = decoder
         self.metrics_type = metrics_type
         self.lang_model_path = lang_model_path
+        self.feature_cache_dir = feature_cache_dir
         self.beam_search_decoder = None
 
     def create_data(self,
@@ -164,7 +167,8 @@ class PPASRTrainer(object):
                                     mean_std_filepath=self.mean_std_path,
                                     min_duration=min_duration,
                                     max_duration=max_duration,
-                                    feature_method=self.feature_method)
+                                    feature_method=self.feature_method,
+                                    cache_dir=self.feature_cache_dir)
         test_loader = DataLoader(dataset=test_dataset,
                                  batch_size=batch_size,
                                  collate_fn=collate_fn,
@@ -220,7 +224,8 @@ class PPASRTrainer(object):
               save_model_path='models/',
               resume_model=None,
               pretrained_model=None,
-              augment_conf_path='conf/augmentation.json'):
+              augment_conf_path='conf/augmentation.json',
+              gpu_spec_augment=False):
         """
         训练模型
         :param batch_size: 训练的批量大小
@@ -232,6 +237,7 @@ class PPASRTrainer(object):
         :param resume_model: 恢复训练，当为None则不使用预训练模型
         :param pretrained_model: 预训练模型的路径，当为None则不使用预训练模型
         :param augment_conf_path: 数据增强的配置文件，为json格式
+        :param gpu_spec_augment: 是否在训练设备上按批次执行频谱增强，开启后不支持时间变形
         """
         # 获取有多少张显卡训练
         nranks = paddle.distributed.get_world_size()
@@ -257,7 +263,8 @@ class PPASRTrainer(object):
                                      min_duration=min_duration,
                                      max_duration=max_duration,
                                      augmentation_config=augmentation_config,
-                                     train=True)
+                                     train=True,
+                                     gpu_spec_augment=gpu_spec_augment)
         # 设置支持多卡训练
         if nranks > 1:
             train_batch_sampler = SortagradDistributedBatchSampler(train_dataset,
@@ -281,7 +288,8 @@ class PPASRTrainer(object):
                                     feature_method=self.feature_method,
                                     mean_std_filepath=self.mean_std_path,
                                     min_duration=min_duration,
-                                    max_duration=max_duration)
+                                    max_duration=max_duration,
+                                    cache_dir=self.feature_cache_dir)
         test_loader = DataLoader(dataset=test_dataset,
                                  batch_size=batch_size,
                                  collate_fn=collate_fn,
@@ -373,6 +381,8 @@ class PPASRTrainer(object):
                 start_epoch = time.time()
                 start = time.time()
                 for batch_id, (inputs, labels, input_lens, label_lens) in enumerate(train_loader()):
+                    if gpu_spec_augment:
+                        inputs = train_dataset.transform_feature_batch(inputs, input_lens)
                     out, out_lens = model(inputs, input_lens)
                     out = paddle.transpose(out, perm=[1, 0, 2])
 
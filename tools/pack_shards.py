@@ -0,0 +1,80 @@
+"""把数据列表中的音频打包成少量连续的PCM分片文件，标签预先转换为int32的令牌索引，
+训练时都通过内存映射读取，避免每条音频都打开一次文件和每轮都重新查词汇表"""
+import json
+import os
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(__dir__)
+sys.path.append(os.path.abspath(os.path.join(__dir__, '..')))
+
+import argparse
+import functools
+
+import numpy as np
+from tqdm import tqdm
+
+from ppasr.data_utils.audio import AudioSegment
+from ppasr.data_utils.featurizer.text_featurizer import TextFeaturizer
+from ppasr.utils.utils import add_arguments, print_arguments
+
+parser = argparse.ArgumentParser(description=__doc__)
+add_arg = functools.partial(add_arguments, argparser=parser)
+add_arg('manifest_path',    str,   'dataset/manifest.train',         '需要打包的数据列表路径')
+add_arg('output_dir',       str,   'dataset/shards/train/',          '分片文件保存的文件夹路径')
+add_arg('index_path',       str,   'dataset/manifest.train.shard',   '分片数据列表的保存路径，训练时代替原来的数据列表使用')
+add_arg('dataset_vocab',    str,   'dataset/vocabulary.txt',         '数据字典的路径，修改了数据字典之后需要重新打包')
+add_arg('shard_size',       int,   1024,                             '每个分片的最大大小，单位为MB')
+args = parser.parse_args()
+
+
+def pack_shards(manifest_path, output_dir, index_path, dataset_vocab, shard_size):
+    os.makedirs(output_dir, exist_ok=True)
+    text_featurizer = TextFeaturizer(dataset_vocab)
+    tokens_path = os.path.join(output_dir, 'tokens.bin')
+    f_tokens = open(tokens_path, 'wb')
+    tokens_offset = 0
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    max_shard_bytes = shard_size * 1024 * 1024
+    shard_id, offset, f_shard, shard_path = -1, 0, None, None
+    with open(index_path, 'w', encoding='utf-8') as f_index:
+        for line in tqdm(lines):
+            line = json.loads(line)
+            try:
+                audio_segment = AudioSegment.from_file(line['audio_filepath'])
+            except Exception as e:
+                print(f'Warning: {line["audio_filepath"]} 读取失败，已跳过，错误信息：{e}')
+                continue
+            samples = audio_segment.to('int16')
+            # 当前分片写满后换下一个分片
+            if f_shard is None or (offset + len(samples)) * 2 > max_shard_bytes:
+                if f_shard is not None:
+                    f_shard.close()
+                shard_id += 1
+                offset = 0
+                shard_path = os.path.join(output_dir, 'shard_{:04d}.bin'.format(shard_id))
+                f_shard = open(shard_path, 'wb')
+            f_shard.write(samples.tobytes())
+            tokens = np.array(text_featurizer.featurize(line["text"]), dtype=np.int32)
+            f_tokens.write(tokens.tobytes())
+            # offset和length的单位都是采样点，tokens_offset和tokens_length的单位是令牌数
+            data = {"shard": shard_path, "offset": offset, "length": len(samples),
+                    "sample_rate": audio_segment.sample_rate, "duration": line["duration"], "text": line["text"],
+                    "tokens": tokens_path, "tokens_offset": tokens_offset, "tokens_length": len(tokens)}
+            f_index.write('{}\n'.format(json.dumps(data, ensure_ascii=False)))
+            offset += len(samples)
+            tokens_offset += len(tokens)
+    if f_shard is not None:
+        f_shard.close()
+    f_tokens.close()
+    print(f'打包完成，一共{shard_id + 1}个分片，分片数据列表：{index_path}')
+
+
+if __name__ == '__main__':
+    print_arguments(args)
+    pack_shards(manifest_path=args.manifest_path,
+                output_dir=args.output_dir,
+                index_path=args.index_path,
+                dataset_vocab=args.dataset_vocab,
+                shard_size=args.shard_size)
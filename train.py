@@ -20,10 +20,12 @@ add_arg('test_manifest',    str,    'dataset/manifest.test',    '测试数据的
 add_arg('dataset_vocab',    str,    'dataset/vocabulary.txt',   '数据字典的路径')
 add_arg('mean_std_path',    str,    'dataset/mean_std.json',    '均值和标准值得json文件路径，后缀 (.json).')
 add_arg('augment_conf_path',str,    'conf/augmentation.json',   '数据增强的配置文件，为json格式')
+add_arg('gpu_spec_augment', bool,   False,                      '是否在训练设备上按批次执行频谱增强')
 add_arg('save_model_path',  str,    'models/',                  '模型保存的路径')
 add_arg('metrics_type',     str,    'cer',                      '计算错误率方法', choices=['cer', 'wer'])
 add_arg('resume_model',     str,    None,                       '恢复训练，当为None则不使用预训练模型')
 add_arg('pretrained_model', str,    None,                       '预训练模型的路径，当为None则不使用预训练模型')
+add_arg('feature_cache_dir',str,    None,                       '测试数据特征缓存的文件夹，当为None时不使用缓存')
 args = parser.parse_args()
 print_arguments(args)
 
@@ -34,7 +36,8 @@ trainer = PPASRTrainer(use_model=args.use_model,
                        test_manifest=args.test_manifest,
                        dataset_vocab=args.dataset_vocab,
                        num_workers=args.num_workers,
-                       metrics_type=args.metrics_type)
+                       metrics_type=args.metrics_type,
+                       feature_cache_dir=args.feature_cache_dir)
 
 trainer.train(batch_size=args.batch_size,
               min_duration=args.min_duration,
@@ -44,4 +47,5 @@ trainer.train(batch_size=args.batch_size,
               save_model_path=args.save_model_path,
               resume_model=args.resume_model,
               pretrained_model=args.pretrained_model,
-              augment_conf_path=args.augment_conf_path)
+              augment_conf_path=args.augment_conf_path,
+              gpu_spec_augment=args.gpu_spec_augment)